@@ -0,0 +1,46 @@
+"""Add computed duration_seconds to sessions
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'sessions',
+        sa.Column(
+            'duration_seconds',
+            sa.Integer(),
+            sa.Computed(
+                "COALESCE(effective_override_seconds, "
+                "GREATEST(trunc(EXTRACT(EPOCH FROM (ended_at - started_at)))::int "
+                "- total_paused_seconds, 0))",
+                persisted=True,
+            ),
+            nullable=True,
+        )
+    )
+    op.create_index(
+        'ix_sessions_confirmed_agg',
+        'sessions',
+        ['user_id', 'subject_id', 'started_at'],
+        postgresql_include=['duration_seconds'],
+        postgresql_where=sa.text("status = 'ENDED_CONFIRMED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_confirmed_agg', table_name='sessions')
+    op.drop_column('sessions', 'duration_seconds')
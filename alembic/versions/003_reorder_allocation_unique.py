@@ -0,0 +1,38 @@
+"""Reorder weekly_allocations unique constraint columns
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lead with subject_id; the (subject_id, week_start_date) prefix
+    # makes ix_allocations_subject_week redundant
+    op.drop_constraint('uq_user_subject_week', 'weekly_allocations', type_='unique')
+    op.create_unique_constraint(
+        'uq_user_subject_week',
+        'weekly_allocations',
+        ['subject_id', 'week_start_date', 'user_id'],
+    )
+    op.drop_index('ix_allocations_subject_week', table_name='weekly_allocations')
+
+
+def downgrade() -> None:
+    op.create_index('ix_allocations_subject_week', 'weekly_allocations', ['subject_id', 'week_start_date'])
+    op.drop_constraint('uq_user_subject_week', 'weekly_allocations', type_='unique')
+    op.create_unique_constraint(
+        'uq_user_subject_week',
+        'weekly_allocations',
+        ['user_id', 'subject_id', 'week_start_date'],
+    )
@@ -0,0 +1,38 @@
+"""Notify session_events when a session is created, changes status or is deleted
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Payload is the affected user_id; workers drop their cached active session
+    op.execute("""
+        CREATE FUNCTION notify_session_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('session_events', COALESCE(NEW.user_id, OLD.user_id));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER sessions_notify_event
+        AFTER INSERT OR DELETE OR UPDATE OF status ON sessions
+        FOR EACH ROW EXECUTE FUNCTION notify_session_event()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER sessions_notify_event ON sessions")
+    op.execute("DROP FUNCTION notify_session_event()")
@@ -0,0 +1,66 @@
+"""Enforce at most one active session per user with a partial unique index
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # End all but the most recent active session per user; a paused one
+    # ends where its pause started so the pause is not counted as work
+    op.execute("""
+        UPDATE sessions s
+        SET status = 'ENDED_UNCONFIRMED',
+            ended_at = COALESCE(s.pause_started_at, now()),
+            pause_started_at = NULL
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id ORDER BY started_at DESC
+            ) AS rn
+            FROM sessions
+            WHERE status IN ('RUNNING', 'PAUSED')
+        ) ranked
+        WHERE s.id = ranked.id AND ranked.rn > 1
+    """)
+    
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_sessions_active_per_user',
+            'sessions',
+            ['user_id'],
+            unique=True,
+            postgresql_where=sa.text("status IN ('RUNNING', 'PAUSED')"),
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_sessions_user_status',
+            table_name='sessions',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sessions_user_status',
+            'sessions',
+            ['user_id', 'status'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'uq_sessions_active_per_user',
+            table_name='sessions',
+            postgresql_concurrently=True,
+        )
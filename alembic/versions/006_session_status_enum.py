@@ -0,0 +1,73 @@
+"""Store sessions.status as a native enum
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SESSION_STATUSES = ('RUNNING', 'PAUSED', 'ENDED_UNCONFIRMED', 'ENDED_CONFIRMED')
+
+
+def _drop_status_dependents() -> None:
+    # Postgres refuses to retype a column named in a trigger, and partial
+    # index predicates must be rebuilt against the new type
+    op.execute("DROP TRIGGER sessions_notify_event ON sessions")
+    op.drop_index('uq_sessions_active_per_user', table_name='sessions')
+    op.drop_index('ix_sessions_confirmed_agg', table_name='sessions')
+
+
+def _create_status_dependents() -> None:
+    op.create_index(
+        'uq_sessions_active_per_user',
+        'sessions',
+        ['user_id'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('RUNNING', 'PAUSED')"),
+    )
+    op.create_index(
+        'ix_sessions_confirmed_agg',
+        'sessions',
+        ['user_id', 'subject_id', 'started_at'],
+        postgresql_include=['duration_seconds'],
+        postgresql_where=sa.text("status = 'ENDED_CONFIRMED'"),
+    )
+    op.execute("""
+        CREATE TRIGGER sessions_notify_event
+        AFTER INSERT OR DELETE OR UPDATE OF status ON sessions
+        FOR EACH ROW EXECUTE FUNCTION notify_session_event()
+    """)
+
+
+def upgrade() -> None:
+    _drop_status_dependents()
+    sa.Enum(*SESSION_STATUSES, name='session_status').create(op.get_bind())
+    op.alter_column(
+        'sessions',
+        'status',
+        type_=sa.Enum(*SESSION_STATUSES, name='session_status'),
+        postgresql_using='status::session_status',
+    )
+    _create_status_dependents()
+
+
+def downgrade() -> None:
+    _drop_status_dependents()
+    op.alter_column(
+        'sessions',
+        'status',
+        type_=sa.String(),
+        postgresql_using='status::text',
+    )
+    sa.Enum(name='session_status').drop(op.get_bind())
+    _create_status_dependents()
@@ -1,33 +1,113 @@
 """Allocation management service for weekly time tracking goals."""
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import select, func
+from sqlalchemy import bindparam, select, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, load_only, selectinload
 
 from app.models import WeeklyAllocation, Subject, Session
 from app.session import get_or_create_user, get_or_create_subject
 
 
-def get_week_start(dt: Optional[datetime] = None, tz: str = "Australia/Sydney") -> datetime:
+_SYDNEY = ZoneInfo("Australia/Sydney")
+_MIDNIGHT = time(0, 0)
+
+
+@lru_cache(maxsize=8)
+def _zone(tz: str) -> ZoneInfo:
+    """Return a cached ZoneInfo for a non-default timezone name."""
+    return ZoneInfo(tz)
+
+
+def get_week_start(dt: Optional[datetime] = None, tz: str = "Australia/Sydney") -> date:
     """
     Get the Monday (week start) for a given date in the specified timezone.
     
-    Returns datetime with date only (no time component).
+    Returns the local date of that Monday.
     """
     if dt is None:
         dt = datetime.now(timezone.utc)
     
     # Convert to target timezone
-    tz_info = ZoneInfo(tz)
+    tz_info = _SYDNEY if tz == "Australia/Sydney" else _zone(tz)
     local_dt = dt.astimezone(tz_info)
     
     # Find Monday
     days_since_monday = local_dt.weekday()  # Monday = 0
-    week_start = local_dt.date() - timedelta(days=days_since_monday)
-    
-    return datetime.combine(week_start, datetime.min.time())
+    return local_dt.date() - timedelta(days=days_since_monday)
+
+
+def _week_params(user_id: str, week_start: date) -> dict:
+    """Bind parameters shared by the weekly allocation statements."""
+    # Week boundaries are local midnights, compared against timestamptz
+    return {
+        "user_id": user_id,
+        "week_start": week_start,
+        "week_start_at": datetime.combine(week_start, _MIDNIGHT, tzinfo=_SYDNEY),
+        "week_end_at": datetime.combine(week_start + timedelta(days=7), _MIDNIGHT, tzinfo=_SYDNEY),
+    }
+
+
+# Hot read statements are built once at import and executed with bind
+# parameters, so each request skips statement construction and hits the
+# compiled cache directly.
+
+# Report paths only render minutes and subject name; skip timestamps
+_ALLOCATION_COLUMNS = (
+    WeeklyAllocation.subject_id,
+    WeeklyAllocation.week_start_date,
+    WeeklyAllocation.minutes_allocated,
+)
+
+# Confirmed seconds per subject for a user's week, summed server-side
+_confirmed_seconds = (
+    select(
+        Session.subject_id,
+        func.sum(Session.duration_seconds).label("seconds"),
+    )
+    .where(
+        Session.user_id == bindparam("user_id"),
+        Session.status == "ENDED_CONFIRMED",
+        Session.started_at >= bindparam("week_start_at"),
+        Session.started_at < bindparam("week_end_at")
+    )
+    .group_by(Session.subject_id)
+    .subquery()
+)
+
+_WEEKLY_ALLOCATIONS_STMT = (
+    select(WeeklyAllocation, func.coalesce(_confirmed_seconds.c.seconds, 0))
+    .outerjoin(_confirmed_seconds, _confirmed_seconds.c.subject_id == WeeklyAllocation.subject_id)
+    .where(
+        WeeklyAllocation.user_id == bindparam("user_id"),
+        WeeklyAllocation.week_start_date == bindparam("week_start")
+    )
+    .options(
+        load_only(*_ALLOCATION_COLUMNS),
+        selectinload(WeeklyAllocation.subject).load_only(Subject.name),
+    )
+    .order_by(WeeklyAllocation.minutes_allocated.desc())
+)
+
+_SUBJECT_ALLOCATION_STMT = (
+    select(WeeklyAllocation, func.coalesce(_confirmed_seconds.c.seconds, 0))
+    .join(WeeklyAllocation.subject)
+    .outerjoin(_confirmed_seconds, _confirmed_seconds.c.subject_id == WeeklyAllocation.subject_id)
+    .where(
+        Subject.user_id == bindparam("user_id"),
+        Subject.name == bindparam("subject_name"),
+        WeeklyAllocation.week_start_date == bindparam("week_start")
+    )
+    .options(
+        load_only(*_ALLOCATION_COLUMNS),
+        contains_eager(WeeklyAllocation.subject).load_only(Subject.name),
+    )
+)
 
 
 async def set_weekly_allocation(
@@ -35,57 +115,172 @@ async def set_weekly_allocation(
     user_id: str,
     subject_name: str,
     hours: float,
-    week_start: Optional[datetime] = None,
+    week_start: Optional[date] = None,
+    minutes: Optional[int] = None,
 ) -> WeeklyAllocation:
     """
     Set or update weekly allocation for a subject.
     
-    If allocation exists for this user/subject/week, update it.
-    Otherwise, create a new one.
+    Inserts a new allocation for this user/subject/week, or updates the
+    existing one via ON CONFLICT. If minutes is given it is used as-is
+    instead of converting hours.
     """
     # Ensure user and subject exist
-    await get_or_create_user(db, user_id)
+    # A new user implies a new subject, whose flush inserts both
+    await get_or_create_user(db, user_id, flush=False)
     subject = await get_or_create_subject(db, user_id, subject_name)
     
     if week_start is None:
         week_start = get_week_start()
     
-    minutes = int(hours * 60)
+    if minutes is None:
+        minutes = round(hours * 60)
     
-    # Check if allocation exists
-    result = await db.execute(
-        select(WeeklyAllocation).where(
-            WeeklyAllocation.user_id == user_id,
-            WeeklyAllocation.subject_id == subject.id,
-            WeeklyAllocation.week_start_date == week_start.date()
-        )
-    )
-    allocation = result.scalar_one_or_none()
-    
-    if allocation:
-        # Update existing
-        allocation.minutes_allocated = minutes
-        allocation.updated_at = datetime.now(timezone.utc)
-    else:
-        # Create new
-        allocation = WeeklyAllocation(
+    now = datetime.now(timezone.utc)
+    
+    # Upsert on the (user, subject, week) unique constraint in one round trip
+    stmt = (
+        pg_insert(WeeklyAllocation)
+        .values(
             user_id=user_id,
             subject_id=subject.id,
-            week_start_date=week_start.date(),
+            week_start_date=week_start,
             minutes_allocated=minutes,
+            created_at=now,
+            updated_at=now,
+        )
+        .on_conflict_do_update(
+            constraint="uq_user_subject_week",
+            set_={"minutes_allocated": minutes, "updated_at": now},
         )
-        db.add(allocation)
+        .returning(WeeklyAllocation)
+        .execution_options(populate_existing=True)
+    )
+    allocation = (await db.execute(stmt)).scalar_one()
     
-    await db.flush()
-    await db.refresh(allocation, ["subject"])
+    # Subject is already loaded; attach it instead of refreshing
+    allocation.subject = subject
     
     return allocation
 
 
+async def set_weekly_allocations_bulk(
+    db: AsyncSession,
+    user_id: str,
+    allocations: Iterable[Tuple[str, float]],
+    week_start: Optional[date] = None,
+) -> List[WeeklyAllocation]:
+    """
+    Set or update weekly allocations for several subjects at once.
+    
+    Takes (subject_name, hours) pairs; a repeated subject keeps its last
+    value. Missing subjects are created, then all allocations are upserted
+    with a single multi-row INSERT ... ON CONFLICT, so the round trips stay
+    constant regardless of how many subjects are set.
+    """
+    hours_by_name = dict(allocations)
+    if not hours_by_name:
+        return []
+    
+    await get_or_create_user(db, user_id)
+    
+    if week_start is None:
+        week_start = get_week_start()
+    
+    # Create any missing subjects, then resolve all of them in one query
+    await db.execute(
+        pg_insert(Subject)
+        .values([{"user_id": user_id, "name": name} for name in hours_by_name])
+        .on_conflict_do_nothing(constraint="uq_user_subject_name")
+    )
+    result = await db.execute(
+        select(Subject).where(
+            Subject.user_id == user_id,
+            Subject.name.in_(hours_by_name)
+        )
+    )
+    subjects = {subject.id: subject for subject in result.scalars()}
+    
+    now = datetime.now(timezone.utc)
+    stmt = pg_insert(WeeklyAllocation).values([
+        {
+            "user_id": user_id,
+            "subject_id": subject.id,
+            "week_start_date": week_start,
+            "minutes_allocated": round(hours_by_name[subject.name] * 60),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for subject in subjects.values()
+    ])
+    stmt = (
+        stmt.on_conflict_do_update(
+            constraint="uq_user_subject_week",
+            set_={
+                "minutes_allocated": stmt.excluded.minutes_allocated,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        .returning(WeeklyAllocation)
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    
+    upserted = list(result.scalars())
+    for allocation in upserted:
+        allocation.subject = subjects[allocation.subject_id]
+    
+    return upserted
+
+
+async def bulk_upsert_allocations(
+    db: AsyncSession,
+    rows: Iterable[Tuple[str, UUID, date, int]],
+) -> int:
+    """
+    Bulk insert or update weekly allocations via COPY.
+    
+    Each row is (user_id, subject_id, week_start_date, minutes_allocated),
+    and must be unique per user/subject/week. Rows are COPYed into a
+    temporary staging table and merged with a single INSERT ... ON CONFLICT,
+    all within the session's transaction.
+    
+    Returns the number of allocations inserted or updated.
+    """
+    conn = await db.connection()
+    await conn.execute(text("DROP TABLE IF EXISTS _alloc_stage"))
+    await conn.execute(text(
+        "CREATE TEMP TABLE _alloc_stage ("
+        "user_id varchar NOT NULL, "
+        "subject_id uuid NOT NULL, "
+        "week_start_date date NOT NULL, "
+        "minutes_allocated integer NOT NULL"
+        ") ON COMMIT DROP"
+    ))
+    
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "_alloc_stage",
+        records=rows,
+        columns=["user_id", "subject_id", "week_start_date", "minutes_allocated"],
+    )
+    
+    result = await conn.execute(text(
+        "INSERT INTO weekly_allocations "
+        "(id, user_id, subject_id, week_start_date, minutes_allocated, created_at, updated_at) "
+        "SELECT gen_random_uuid(), user_id, subject_id, week_start_date, minutes_allocated, now(), now() "
+        "FROM _alloc_stage "
+        "ON CONFLICT ON CONSTRAINT uq_user_subject_week DO UPDATE "
+        "SET minutes_allocated = EXCLUDED.minutes_allocated, updated_at = EXCLUDED.updated_at"
+    ))
+    
+    return result.rowcount
+
+
 async def get_weekly_allocations(
     db: AsyncSession,
     user_id: str,
-    week_start: Optional[datetime] = None,
+    week_start: Optional[date] = None,
 ) -> List[tuple]:
     """
     Get all weekly allocations for a user for a specific week.
@@ -96,58 +291,16 @@ async def get_weekly_allocations(
     if week_start is None:
         week_start = get_week_start()
     
-    week_end = week_start + timedelta(days=7)
+    result = await db.execute(_WEEKLY_ALLOCATIONS_STMT, _week_params(user_id, week_start))
     
-    # Get all allocations for this week
-    result = await db.execute(
-        select(WeeklyAllocation)
-        .where(
-            WeeklyAllocation.user_id == user_id,
-            WeeklyAllocation.week_start_date == week_start.date()
-        )
-        .order_by(WeeklyAllocation.minutes_allocated.desc())
-    )
-    allocations = result.scalars().all()
-    
-    # For each allocation, calculate actual time spent
-    allocation_data = []
-    
-    for alloc in allocations:
-        await db.refresh(alloc, ["subject"])
-        
-        # Get confirmed sessions for this subject in this week
-        sessions_result = await db.execute(
-            select(Session).where(
-                Session.user_id == user_id,
-                Session.subject_id == alloc.subject_id,
-                Session.status == "ENDED_CONFIRMED",
-                Session.started_at >= week_start,
-                Session.started_at < week_end
-            )
-        )
-        sessions = sessions_result.scalars().all()
-        
-        # Calculate total time spent
-        total_seconds = 0
-        for session in sessions:
-            if session.effective_override_seconds is not None:
-                total_seconds += session.effective_override_seconds
-            else:
-                if session.ended_at:
-                    base = int((session.ended_at - session.started_at).total_seconds())
-                    total_seconds += max(0, base - session.total_paused_seconds)
-        
-        minutes_spent = total_seconds // 60
-        allocation_data.append((alloc, minutes_spent))
-    
-    return allocation_data
+    return [(alloc, int(seconds) // 60) for alloc, seconds in result.all()]
 
 
 async def get_subject_allocation(
     db: AsyncSession,
     user_id: str,
     subject_name: str,
-    week_start: Optional[datetime] = None,
+    week_start: Optional[date] = None,
 ) -> Optional[tuple]:
     """
     Get allocation for a specific subject.
@@ -157,55 +310,15 @@ async def get_subject_allocation(
     if week_start is None:
         week_start = get_week_start()
     
-    # Get subject
+    # Subject, allocation and time spent in one round trip
     result = await db.execute(
-        select(Subject).where(
-            Subject.user_id == user_id,
-            Subject.name == subject_name
-        )
+        _SUBJECT_ALLOCATION_STMT,
+        {**_week_params(user_id, week_start), "subject_name": subject_name},
     )
-    subject = result.scalar_one_or_none()
+    row = result.one_or_none()
     
-    if not subject:
+    if not row:
         return None
     
-    # Get allocation
-    alloc_result = await db.execute(
-        select(WeeklyAllocation).where(
-            WeeklyAllocation.user_id == user_id,
-            WeeklyAllocation.subject_id == subject.id,
-            WeeklyAllocation.week_start_date == week_start.date()
-        )
-    )
-    allocation = alloc_result.scalar_one_or_none()
-    
-    if not allocation:
-        return None
-    
-    await db.refresh(allocation, ["subject"])
-    
-    # Calculate time spent
-    week_end = week_start + timedelta(days=7)
-    sessions_result = await db.execute(
-        select(Session).where(
-            Session.user_id == user_id,
-            Session.subject_id == subject.id,
-            Session.status == "ENDED_CONFIRMED",
-            Session.started_at >= week_start,
-            Session.started_at < week_end
-        )
-    )
-    sessions = sessions_result.scalars().all()
-    
-    total_seconds = 0
-    for session in sessions:
-        if session.effective_override_seconds is not None:
-            total_seconds += session.effective_override_seconds
-        else:
-            if session.ended_at:
-                base = int((session.ended_at - session.started_at).total_seconds())
-                total_seconds += max(0, base - session.total_paused_seconds)
-    
-    minutes_spent = total_seconds // 60
-    
-    return (allocation, minutes_spent)
+    allocation, seconds = row
+    return (allocation, int(seconds) // 60)
@@ -0,0 +1,214 @@
+"""In-process caches for hot database lookups."""
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Hashable, Optional, Union
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession, make_transient_to_detached
+
+from app.database import engine
+from app.models import Subject
+
+
+class LRUCache:
+    """A size-capped mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss."""
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value under key, evicting the oldest entry if full."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """Invalidate key if present."""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._data.clear()
+
+
+# (user_id, subject_name) and subject id -> detached Subject, re-attached
+# with session.merge(..., load=False) so a hit costs no SELECT
+subject_cache = LRUCache(maxsize=2048)
+
+
+_SUBJECT_CACHE_UPDATES = "subject_cache_updates"
+
+
+def cache_subject(db: Any, subject: Subject) -> None:
+    """
+    Cache a detached copy of a subject under its name and id.
+    
+    The row may still be uncommitted in db's transaction, so the copy is
+    staged and only cached once db commits; it is discarded on rollback.
+    """
+    detached = Subject(
+        id=subject.id,
+        user_id=subject.user_id,
+        name=subject.name,
+        created_at=subject.created_at,
+    )
+    make_transient_to_detached(detached)
+    db.info.setdefault(_SUBJECT_CACHE_UPDATES, []).append(detached)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_subject_cache_updates(session: OrmSession) -> None:
+    for subject in session.info.pop(_SUBJECT_CACHE_UPDATES, []):
+        subject_cache.set((subject.user_id, subject.name), subject)
+        subject_cache.set(subject.id, subject)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_subject_cache_updates(session: OrmSession) -> None:
+    session.info.pop(_SUBJECT_CACHE_UPDATES, None)
+
+
+# Returned by get_cached_active_session_id when the cache has no answer
+UNKNOWN = object()
+
+# user_id -> id of the user's RUNNING/PAUSED session, or None when the user
+# is known to have none. Changes made by a transaction are staged on its
+# session and only applied once it commits. The cache is only trusted while
+# this worker is LISTENing for other workers' changes.
+active_session_cache = LRUCache(maxsize=4096)
+_listening = False
+
+_ACTIVE_SESSION_UPDATES = "active_session_updates"
+
+
+def get_cached_active_session_id(user_id: str) -> Union[UUID, None, object]:
+    """Return the cached active session id, None if known to have none, or UNKNOWN."""
+    if not _listening:
+        return UNKNOWN
+    return active_session_cache.get(user_id, UNKNOWN)
+
+
+def remember_active_session(user_id: str, session_id: UUID) -> None:
+    """Cache an active session id just read from the database."""
+    if _listening:
+        active_session_cache.set(user_id, session_id)
+
+
+def forget_active_session(user_id: str) -> None:
+    """Drop the user's cached active session so the next lookup reads the database."""
+    active_session_cache.pop(user_id)
+
+
+def stage_active_session(db: Any, user_id: str, session_id: Optional[UUID]) -> None:
+    """
+    Record the user's new active session (None for no active session).
+    
+    Applied to the cache when db commits; discarded on rollback.
+    """
+    db.info.setdefault(_ACTIVE_SESSION_UPDATES, {})[user_id] = session_id
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_active_session_updates(session: OrmSession) -> None:
+    updates = session.info.pop(_ACTIVE_SESSION_UPDATES, {})
+    if _listening:
+        for user_id, session_id in updates.items():
+            active_session_cache.set(user_id, session_id)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_active_session_updates(session: OrmSession) -> None:
+    session.info.pop(_ACTIVE_SESSION_UPDATES, None)
+
+
+# Postgres channel the sessions trigger notifies with the affected user_id
+SESSION_EVENTS_CHANNEL = "session_events"
+
+
+def _on_session_event(connection: Any, pid: int, channel: str, user_id: str) -> None:
+    forget_active_session(user_id)
+
+
+_LISTEN_PING_INTERVAL = 30  # seconds between liveness checks
+_LISTEN_PING_TIMEOUT = 5
+_LISTEN_MAX_BACKOFF = 30
+
+
+def _set_listening(listening: bool) -> None:
+    """Switch cache trust on or off; entries from either side of a gap are dropped."""
+    global _listening
+    _listening = listening
+    active_session_cache.clear()
+
+
+async def _listen_until_lost() -> None:
+    """LISTEN on one connection until it closes or stops answering pings."""
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        lost = asyncio.Event()
+        driver.add_termination_listener(lambda connection: lost.set())
+        await driver.add_listener(SESSION_EVENTS_CHANNEL, _on_session_event)
+        _set_listening(True)
+        try:
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), _LISTEN_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    try:
+                        await driver.execute("SELECT 1", timeout=_LISTEN_PING_TIMEOUT)
+                    except Exception as e:
+                        print(f"⚠️ session_events listener ping failed ({e!r})")
+                        break
+        finally:
+            _set_listening(False)
+            # Never hand a LISTENing (or dead) connection back to the pool
+            await conn.invalidate()
+
+
+async def _listen_forever() -> None:
+    """Keep a session_events listener up, reconnecting with backoff."""
+    delay = 1
+    while True:
+        try:
+            await _listen_until_lost()
+            # It was up until now, so start the backoff over
+            delay = 1
+            print(f"⚠️ session_events listener lost, reconnecting in {delay}s")
+        except Exception as e:
+            print(f"⚠️ session_events listener failed ({e!r}), retrying in {delay}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _LISTEN_MAX_BACKOFF)
+
+
+@asynccontextmanager
+async def listen_for_session_events() -> AsyncIterator[None]:
+    """
+    Keep a connection LISTENing on session_events so sessions changed by
+    other workers are evicted from this worker's active session cache.
+    
+    The cache is bypassed whenever the listener is down, and cleared when
+    it goes down or comes back. The listener holds one pooled connection
+    for the app lifetime.
+    """
+    listener = asyncio.create_task(_listen_forever())
+    try:
+        yield
+    finally:
+        listener.cancel()
+        try:
+            await listener
+        except asyncio.CancelledError:
+            pass
@@ -24,8 +24,20 @@ elif not DATABASE_URL.startswith("postgresql+asyncpg://"):
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,  # Set to False in production
+    echo=os.environ.get("SQL_ECHO", "0") == "1",  # Set SQL_ECHO=1 to log SQL
     future=True,
+    pool_pre_ping=True,
+    pool_size=int(os.environ.get("DB_POOL_SIZE", "10")),
+    max_overflow=20,
+    connect_args={
+        # Small OLTP queries only pay latency for JIT compilation
+        "server_settings": {"jit": "off", "application_name": "flae-bot"},
+        # SQLAlchemy's asyncpg adapter prepares statements itself, bypassing
+        # asyncpg's own statement cache; this per-connection LRU is the one
+        # that applies. Sized well above the app's distinct statements so
+        # none are evicted and re-prepared.
+        "prepared_statement_cache_size": 512,
+    },
 )
 
 # Create async session factory
@@ -54,3 +66,17 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+@asynccontextmanager
+async def read_only_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Open a session for read-only work outside a request.
+    
+    Runs on an AUTOCOMMIT connection, so no BEGIN/COMMIT round trips are
+    issued and nothing is committed on exit.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        async with AsyncSessionLocal(bind=conn) as session:
+            yield session
@@ -1,38 +1,65 @@
 """FastAPI dependencies for Discord bot."""
 import os
-from typing import Any, Dict
+from typing import Annotated
 
+import httpx
+import msgspec
 from fastapi import Header, HTTPException, Request
 from nacl.exceptions import BadSignatureError
 from nacl.signing import VerifyKey
 
+from app.interaction import Interaction
+
 
 DISCORD_PUBLIC_KEY = os.environ.get("DISCORD_PUBLIC_KEY")
 
 if not DISCORD_PUBLIC_KEY:
     raise RuntimeError("Set DISCORD_PUBLIC_KEY env var")
 
+# The public key never changes; parse it once at import
+_VERIFY_KEY = VerifyKey(bytes.fromhex(DISCORD_PUBLIC_KEY))
+
+_INTERACTION_DECODER = msgspec.json.Decoder(Interaction)
+
+_HEX = frozenset("0123456789abcdefABCDEF")
+_SIGNATURE_HEX_LENGTH = 128  # 64-byte Ed25519 signature
+
+
+def _is_hex(value: str, length: int) -> bool:
+    """Check that value is exactly `length` hex characters."""
+    return len(value) == length and _HEX.issuperset(value)
+
 
 async def verify_discord_request(
     request: Request,
-    x_signature_ed25519: str = Header(..., alias="X-Signature-Ed25519"),
-    x_signature_timestamp: str = Header(..., alias="X-Signature-Timestamp"),
-) -> Dict[str, Any]:
+    x_signature_ed25519: Annotated[str, Header(alias="X-Signature-Ed25519")],
+    x_signature_timestamp: Annotated[str, Header(alias="X-Signature-Timestamp")],
+) -> Interaction:
     """
-    Verify Discord request signature and return parsed payload.
+    Verify Discord request signature and return the decoded interaction.
     
     Discord signs: timestamp + raw_body
     Verify using app public key (Ed25519).
     """
+    # Reject malformed signatures before reading the body or verifying
+    if not _is_hex(x_signature_ed25519, _SIGNATURE_HEX_LENGTH):
+        raise HTTPException(status_code=401, detail="Invalid request signature")
+    
     raw_body = await request.body()
     
     try:
-        verify_key = VerifyKey(bytes.fromhex(DISCORD_PUBLIC_KEY))
-        message = x_signature_timestamp.encode("utf-8") + raw_body
-        verify_key.verify(message, bytes.fromhex(x_signature_ed25519))
+        message = x_signature_timestamp.encode() + raw_body
+        _VERIFY_KEY.verify(message, bytes.fromhex(x_signature_ed25519))
     except (BadSignatureError, ValueError) as e:
         raise HTTPException(status_code=401, detail="Invalid request signature") from e
     
-    # Parse and return payload
-    payload: Dict[str, Any] = await request.json()
-    return payload
+    # Decode the already-read body straight into typed structs
+    try:
+        return _INTERACTION_DECODER.decode(raw_body)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=400, detail="Invalid interaction payload") from e
+
+
+def get_http(request: Request) -> httpx.AsyncClient:
+    """Return the shared Discord HTTP client opened in the app lifespan."""
+    return request.app.state.http
@@ -1,13 +1,18 @@
 """Discord interaction router and handlers."""
+import asyncio
 import json
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+from collections import OrderedDict
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request
-from fastapi.responses import JSONResponse
+import httpx
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, read_only_session
 from app.session import (
     clock_in,
     clock_out,
@@ -26,22 +31,80 @@ from app.allocation import (
     set_weekly_allocation,
     get_weekly_allocations,
 )
-from app.dependencies import verify_discord_request
+from app.dependencies import get_http, verify_discord_request
+from app.interaction import Interaction
+from app.write_queue import enqueue_write
 
 
 router = APIRouter()
 
 
+# Fixed interaction responses, serialized once at import. Only the bytes are
+# shared: FastAPI attaches per-request state to a returned Response, so each
+# call wraps them in a new one.
+def _message(content: str, ephemeral: bool = False) -> bytes:
+    """Serialize a CHANNEL_MESSAGE_WITH_SOURCE response."""
+    data: Dict[str, Any] = {"content": content}
+    if ephemeral:
+        data["flags"] = 64
+    return orjson.dumps({"type": 4, "data": data})
+
+
+def _reply(body: bytes) -> Response:
+    """Wrap a pre-serialized interaction response."""
+    return Response(content=body, media_type="application/json")
+
+
+_PONG = orjson.dumps({"type": 1})
+_DEFERRED = orjson.dumps({"type": 5})  # DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE
+_UNHANDLED_INTERACTION = _message("Unhandled interaction type.")
+_UNKNOWN_COMMAND = _message("Unknown command.")
+_SUBJECT_REQUIRED = _message("Subject is required.")
+_NO_SESSION_TO_CLOCK_OUT = _message("❌ No active session to clock out.")
+_NO_SESSION_TO_PAUSE = _message("❌ No running session to pause.")
+_NO_SESSION_TO_RESUME = _message("❌ No paused session to resume.")
+_NO_ACTIVE_SESSION = _message("No active session.")
+_ALLOC_ARGS_REQUIRED = _message("Subject and hours are required.")
+_INVALID_HOURS = _message("Invalid hours value.")
+_INVALID_BUTTON = _message("Invalid button.")
+_INVALID_SESSION_ID = _message("Invalid session ID.")
+_SESSION_ACCESS_DENIED = _message("❌ Session not found or access denied.")
+_CANNOT_REOPEN = _message("❌ Cannot reopen: you have another active session.", ephemeral=True)
+_ACTION_FAILED = _message("Action failed.", ephemeral=True)
+_INVALID_MODAL = _message("Invalid modal.")
+_DURATION_REQUIRED = _message("❌ Duration is required.", ephemeral=True)
+_ADJUST_FAILED = _message("❌ Failed to adjust time. Check your format.", ephemeral=True)
+_GOAL_UPDATE_FAILED = _message("❌ Failed to update goal.", ephemeral=True)
+_UNKNOWN_MODAL = _message("Unknown modal type.", ephemeral=True)
+
+
+# Status indicator shown in the session message header
+_STATUS_EMOJI = {
+    "RUNNING": "▶️",
+    "PAUSED": "⏸️",
+    "ENDED_UNCONFIRMED": "⏹️",
+    "ENDED_CONFIRMED": "✅",
+}
+
+# Buttons per session status: one tuple per action row of (label, style, action).
+# Styles: 1 = Primary, 2 = Secondary, 3 = Success, 4 = Danger
+_STATUS_BUTTONS = {
+    "RUNNING": (
+        (("Pause", 2, "pause"), ("Clock Out", 4, "out"), ("Edit Goal", 1, "edit_goal")),
+    ),
+    "PAUSED": (
+        (("Resume", 3, "resume"), ("Clock Out", 4, "out"), ("Edit Goal", 1, "edit_goal")),
+    ),
+    "ENDED_UNCONFIRMED": (
+        (("✅ Confirm", 3, "confirm"), ("↩️ Reopen", 2, "reopen")),
+        (("✏️ Adjust Time", 1, "adjust_time"), ("✏️ Edit Goal", 1, "edit_goal")),
+    ),
+}
+
+
 def create_session_status_message(session, effective_seconds: int) -> Dict[str, Any]:
     """Create a message showing session status with action buttons."""
-    status_emoji = {
-        "RUNNING": "▶️",
-        "PAUSED": "⏸️",
-        "ENDED_UNCONFIRMED": "⏹️",
-        "ENDED_CONFIRMED": "✅",
-    }
-    
-    emoji = status_emoji.get(session.status, "⏺️")
+    emoji = _STATUS_EMOJI.get(session.status, "⏺️")
     status_text = session.status.replace("_", " ").title()
     
     lines = [
@@ -60,96 +123,21 @@ def create_session_status_message(session, effective_seconds: int) -> Dict[str,
     message = "\n".join(lines)
     
     # Add buttons based on status
-    components = []
-    if session.status == "RUNNING":
-        components = [
-            {
-                "type": 1,  # Action Row
-                "components": [
-                    {
-                        "type": 2,  # Button
-                        "style": 2,  # Secondary
-                        "label": "Pause",
-                        "custom_id": f"pause:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 4,  # Danger
-                        "label": "Clock Out",
-                        "custom_id": f"out:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 1,  # Primary
-                        "label": "Edit Goal",
-                        "custom_id": f"edit_goal:{session.id}",
-                    },
-                ]
-            }
-        ]
-    elif session.status == "PAUSED":
-        components = [
-            {
-                "type": 1,
-                "components": [
-                    {
-                        "type": 2,
-                        "style": 3,  # Success
-                        "label": "Resume",
-                        "custom_id": f"resume:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 4,  # Danger
-                        "label": "Clock Out",
-                        "custom_id": f"out:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 1,
-                        "label": "Edit Goal",
-                        "custom_id": f"edit_goal:{session.id}",
-                    },
-                ]
-            }
-        ]
-    elif session.status == "ENDED_UNCONFIRMED":
-        components = [
-            {
-                "type": 1,
-                "components": [
-                    {
-                        "type": 2,
-                        "style": 3,  # Success
-                        "label": "✅ Confirm",
-                        "custom_id": f"confirm:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 2,  # Secondary
-                        "label": "↩️ Reopen",
-                        "custom_id": f"reopen:{session.id}",
-                    },
-                ]
-            },
-            {
-                "type": 1,
-                "components": [
-                    {
-                        "type": 2,
-                        "style": 1,  # Primary
-                        "label": "✏️ Adjust Time",
-                        "custom_id": f"adjust_time:{session.id}",
-                    },
-                    {
-                        "type": 2,
-                        "style": 1,
-                        "label": "✏️ Edit Goal",
-                        "custom_id": f"edit_goal:{session.id}",
-                    },
-                ]
-            }
-        ]
+    components = [
+        {
+            "type": 1,  # Action Row
+            "components": [
+                {
+                    "type": 2,  # Button
+                    "style": style,
+                    "label": label,
+                    "custom_id": f"{action}:{session.id}",
+                }
+                for label, style, action in row
+            ],
+        }
+        for row in _STATUS_BUTTONS.get(session.status, ())
+    ]
     
     return {
         "content": message,
@@ -157,6 +145,11 @@ def create_session_status_message(session, effective_seconds: int) -> Dict[str,
     }
 
 
+# Progress bars for 0..10 filled cells
+_BAR_LENGTH = 10
+_BARS = tuple("█" * i + "░" * (_BAR_LENGTH - i) for i in range(_BAR_LENGTH + 1))
+
+
 def create_allocation_summary_message(allocations: List[tuple]) -> str:
     """Create a summary message for weekly allocations."""
     if not allocations:
@@ -171,71 +164,117 @@ def create_allocation_summary_message(allocations: List[tuple]) -> str:
         
         percentage = (minutes_spent / minutes_allocated * 100) if minutes_allocated > 0 else 0
         
-        # Progress bar
-        bar_length = 10
-        filled = int(bar_length * min(percentage, 100) / 100)
-        bar = "█" * filled + "░" * (bar_length - filled)
+        filled = int(_BAR_LENGTH * min(percentage, 100) / 100)
         
         lines.append(
             f"**{alloc.subject.name}:** {hours_spent:.1f}h / {hours_allocated:.1f}h "
-            f"({percentage:.0f}%)\n{bar}"
+            f"({percentage:.0f}%)\n{_BARS[filled]}"
         )
     
     return "\n".join(lines)
 
 
+# Interaction id -> future resolving to its response, oldest first
+_RECENT_INTERACTIONS_MAX = 4096
+_recent_interactions: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+
+
 @router.post("/interactions")
 async def discord_interactions(
     request: Request,
-    db: AsyncSession = Depends(get_db),
-    payload: Dict[str, Any] = Depends(verify_discord_request),
     background_task: BackgroundTasks,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    interaction: Annotated[Interaction, Depends(verify_discord_request)],
+    http: Annotated[httpx.AsyncClient, Depends(get_http)],
 ):
-    """Handle all Discord interactions."""
-    interaction_type = payload.get("type")
+    """
+    Handle all Discord interactions.
+    
+    Deliveries of an interaction id that is already in flight, or was
+    handled recently, share the first delivery's response instead of
+    running the handler again.
+    """
+    interaction_id = interaction.id
+    if interaction_id is None:
+        return await dispatch_interaction(interaction, db, background_task, http)
+    
+    existing = _recent_interactions.get(interaction_id)
+    if existing is not None:
+        response = await asyncio.shield(existing)
+        # FastAPI attaches background tasks to the returned object, so hand
+        # out a fresh response rather than the one already sent
+        return Response(
+            content=response.body,
+            status_code=response.status_code,
+            media_type=response.media_type,
+        )
+    
+    future = asyncio.get_running_loop().create_future()
+    _recent_interactions[interaction_id] = future
+    if len(_recent_interactions) > _RECENT_INTERACTIONS_MAX:
+        _recent_interactions.popitem(last=False)
+    
+    try:
+        response = await dispatch_interaction(interaction, db, background_task, http)
+    except BaseException:
+        # Let a redelivery run the handler again
+        _recent_interactions.pop(interaction_id, None)
+        future.cancel()
+        raise
+    
+    future.set_result(response)
+    return response
+
+
+async def dispatch_interaction(
+    interaction: Interaction,
+    db: AsyncSession,
+    background_task: BackgroundTasks,
+    http: httpx.AsyncClient,
+) -> Response:
+    """Route an interaction to its handler by type."""
+    interaction_type = interaction.type
     
     # 1 = PING
     if interaction_type == 1:
-        return JSONResponse({"type": 1})
+        return _reply(_PONG)
     
-    user_id = payload.get("member", {}).get("user", {}).get("id") or payload.get("user", {}).get("id")
+    user_id = interaction.user_id
     
     # 2 = APPLICATION_COMMAND (slash command)
     if interaction_type == 2:
-        return await handle_command(payload, user_id, db)
+        return await handle_command(interaction, user_id, db, background_task, http)
     
     # 3 = MESSAGE_COMPONENT (button click)
     if interaction_type == 3:
-        return await handle_button(payload, user_id, db)
+        return await handle_button(interaction, user_id, db)
     
     # 5 = MODAL_SUBMIT
     if interaction_type == 5:
-        return await handle_modal(payload, user_id, db)
+        return await handle_modal(interaction, user_id, db)
     
-    return JSONResponse({"type": 4, "data": {"content": "Unhandled interaction type."}})
+    return _reply(_UNHANDLED_INTERACTION)
 
 
 async def handle_command(
-    payload: Dict[str, Any],
+    interaction: Interaction,
     user_id: str,
     db: AsyncSession,
-) -> JSONResponse:
+    background_task: BackgroundTasks,
+    http: httpx.AsyncClient,
+) -> Response:
     """Handle slash commands."""
-    data = payload.get("data", {})
-    command_name = data.get("name")
+    command_name = interaction.data.name
     
     # Parse subcommand if exists
-    options = data.get("options", [])
+    options = interaction.data.options
     subcommand = None
-    subcommand_options = {}
     
-    if options and options[0].get("type") == 1:  # SUB_COMMAND
-        subcommand = options[0].get("name")
-        for opt in options[0].get("options", []):
-            subcommand_options[opt["name"]] = opt["value"]
-    else:
-        for opt in options:
-            subcommand_options[opt["name"]] = opt["value"]
+    if options and options[0].type == 1:  # SUB_COMMAND
+        subcommand = options[0].name
+        options = options[0].options
+    
+    subcommand_options = {opt.name: opt.value for opt in options}
     
     # /session commands
     if command_name == "session":
@@ -255,263 +294,277 @@ async def handle_command(
         if subcommand == "set":
             return await handle_alloc_set(user_id, subcommand_options, db)
         elif subcommand == "show":
-            return await handle_alloc_show(user_id, db)
+            return await handle_alloc_show(interaction, user_id, background_task, http)
     
-    return JSONResponse({"type": 4, "data": {"content": "Unknown command."}})
+    return _reply(_UNKNOWN_COMMAND)
 
 
 async def handle_session_in(
     user_id: str,
     options: Dict[str, Any],
     db: AsyncSession,
-) -> JSONResponse:
+) -> Response:
     """Handle /session in command."""
     subject = options.get("subject")
     goal = options.get("goal")
     
     if not subject:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Subject is required."}
-        })
+        return _reply(_SUBJECT_REQUIRED)
     
-    session, is_new = await clock_in(db, user_id, subject, goal)
+    now = datetime.now(timezone.utc)
+    session, is_new = await clock_in(db, user_id, subject, goal, now=now)
     
     if not is_new:
-        effective = calculate_effective_time(session)
+        effective = calculate_effective_time(session, now)
         msg = create_session_status_message(session, effective)
         msg["content"] = "⚠️ You already have an active session!\n\n" + msg["content"]
-        return JSONResponse({"type": 4, "data": msg})
+        return ORJSONResponse({"type": 4, "data": msg})
     
     await db.commit()
     
-    effective = calculate_effective_time(session)
+    effective = calculate_effective_time(session, now)
     msg = create_session_status_message(session, effective)
     msg["content"] = "✅ Clocked in!\n\n" + msg["content"]
     
-    return JSONResponse({"type": 4, "data": msg})
+    return ORJSONResponse({"type": 4, "data": msg})
 
 
 async def handle_session_out(
     user_id: str,
     options: Dict[str, Any],
     db: AsyncSession,
-) -> JSONResponse:
+) -> Response:
     """Handle /session out command."""
     note = options.get("note")
     
-    session = await clock_out(db, user_id, note)
+    now = datetime.now(timezone.utc)
+    session = await clock_out(db, user_id, note, now=now)
     
     if not session:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "❌ No active session to clock out."}
-        })
+        return _reply(_NO_SESSION_TO_CLOCK_OUT)
     
     await db.commit()
     
-    effective = calculate_effective_time(session)
+    effective = calculate_effective_time(session, now)
     msg = create_session_status_message(session, effective)
     msg["content"] = "⏹️ Clocked out!\n\n" + msg["content"]
     
-    return JSONResponse({"type": 4, "data": msg})
+    return ORJSONResponse({"type": 4, "data": msg})
 
 
-async def handle_session_pause(user_id: str, db: AsyncSession) -> JSONResponse:
+async def handle_session_pause(user_id: str, db: AsyncSession) -> Response:
     """Handle /session pause command."""
-    session = await pause_session(db, user_id)
+    now = datetime.now(timezone.utc)
+    session = await pause_session(db, user_id, now=now)
     
     if not session:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "❌ No running session to pause."}
-        })
+        return _reply(_NO_SESSION_TO_PAUSE)
     
     await db.commit()
     
-    effective = calculate_effective_time(session)
+    effective = calculate_effective_time(session, now)
     msg = create_session_status_message(session, effective)
     msg["content"] = "⏸️ Session paused!\n\n" + msg["content"]
     
-    return JSONResponse({"type": 4, "data": msg})
+    return ORJSONResponse({"type": 4, "data": msg})
 
 
-async def handle_session_resume(user_id: str, db: AsyncSession) -> JSONResponse:
+async def handle_session_resume(user_id: str, db: AsyncSession) -> Response:
     """Handle /session resume command."""
-    session = await resume_session(db, user_id)
+    now = datetime.now(timezone.utc)
+    session = await resume_session(db, user_id, now=now)
     
     if not session:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "❌ No paused session to resume."}
-        })
+        return _reply(_NO_SESSION_TO_RESUME)
     
     await db.commit()
     
-    effective = calculate_effective_time(session)
+    effective = calculate_effective_time(session, now)
     msg = create_session_status_message(session, effective)
     msg["content"] = "▶️ Session resumed!\n\n" + msg["content"]
     
-    return JSONResponse({"type": 4, "data": msg})
+    return ORJSONResponse({"type": 4, "data": msg})
 
 
-async def handle_session_status(user_id: str, db: AsyncSession) -> JSONResponse:
+async def handle_session_status(user_id: str, db: AsyncSession) -> Response:
     """Handle /session status command."""
     session = await get_active_session(db, user_id)
     
     if not session:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "No active session."}
-        })
+        return _reply(_NO_ACTIVE_SESSION)
     
     effective = calculate_effective_time(session)
     msg = create_session_status_message(session, effective)
     
-    return JSONResponse({"type": 4, "data": msg})
+    return ORJSONResponse({"type": 4, "data": msg})
 
 
 async def handle_alloc_set(
     user_id: str,
     options: Dict[str, Any],
     db: AsyncSession,
-) -> JSONResponse:
+) -> Response:
     """Handle /alloc set command."""
     subject = options.get("subject")
     hours = options.get("hours")
     
     if not subject or hours is None:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Subject and hours are required."}
-        })
+        return _reply(_ALLOC_ARGS_REQUIRED)
     
     try:
         hours_float = float(hours)
         if hours_float < 0:
             raise ValueError("Hours must be positive")
     except ValueError:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Invalid hours value."}
-        })
+        return _reply(_INVALID_HOURS)
     
-    allocation = await set_weekly_allocation(db, user_id, subject, hours_float)
-    await db.commit()
+    # Idempotent upsert: applied by the write-behind queue after responding
+    enqueue_write(set_weekly_allocation, user_id, subject, hours_float)
     
-    return JSONResponse({
+    return ORJSONResponse({
         "type": 4,
         "data": {
-            "content": f"✅ Set weekly allocation for **{allocation.subject.name}**: {hours_float}h"
+            "content": f"✅ Set weekly allocation for **{subject}**: {hours_float}h"
         }
     })
 
 
-async def handle_alloc_show(user_id: str, db: AsyncSession) -> JSONResponse:
-    """Handle /alloc show command."""
-    allocations = await get_weekly_allocations(db, user_id)
-    message = create_allocation_summary_message(allocations)
-    
-    return JSONResponse({
-        "type": 4,
-        "data": {"content": message}
-    })
+async def handle_alloc_show(
+    interaction: Interaction,
+    user_id: str,
+    background_task: BackgroundTasks,
+    http: httpx.AsyncClient,
+) -> Response:
+    """
+    Handle /alloc show command.
+    
+    Acknowledges immediately with a deferred response; the summary is
+    computed after the response is sent and edited into the message.
+    """
+    background_task.add_task(
+        _send_allocation_summary,
+        http,
+        user_id,
+        interaction.application_id,
+        interaction.token,
+    )
+    return _reply(_DEFERRED)
+
+
+async def _send_allocation_summary(
+    http: httpx.AsyncClient,
+    user_id: str,
+    application_id: str,
+    token: str,
+) -> None:
+    """
+    Build the weekly allocation summary and edit it into the deferred response.
+    
+    Runs after the response is sent, so failures are reported by editing an
+    error into the message instead of leaving it stuck on "thinking".
+    """
+    try:
+        # The request's session is closed by now, so open a fresh one
+        async with read_only_session() as db:
+            allocations = await get_weekly_allocations(db, user_id)
+            message = create_allocation_summary_message(allocations)
+        
+        await _edit_original_response(http, application_id, token, {"content": message})
+    except Exception as e:
+        print(f"❌ Allocation summary failed for {user_id}: {e!r}")
+        try:
+            await _edit_original_response(
+                http, application_id, token,
+                {"content": "❌ Failed to load allocations. Please try again."},
+            )
+        except Exception as e:
+            print(f"❌ Could not report allocation summary failure: {e!r}")
+
+
+async def _edit_original_response(
+    http: httpx.AsyncClient,
+    application_id: str,
+    token: str,
+    data: Dict[str, Any],
+) -> None:
+    """Edit the original interaction response through Discord's webhook API."""
+    r = await http.patch(f"/webhooks/{application_id}/{token}/messages/@original", json=data)
+    r.raise_for_status()
+
+
+# Button actions that mutate the session: action -> (operation, message prefix).
+# Each operation is called as operation(db, user_id, session, now) with the session
+# already loaded by the ownership check, so it is not queried again.
+_BUTTON_ACTIONS: Dict[str, Tuple[Callable[..., Awaitable[Any]], str]] = {
+    "pause": (
+        lambda db, user_id, session, now: pause_session(db, user_id, session=session, now=now),
+        "⏸️ Session paused!",
+    ),
+    "resume": (
+        lambda db, user_id, session, now: resume_session(db, user_id, session=session, now=now),
+        "▶️ Session resumed!",
+    ),
+    "out": (
+        lambda db, user_id, session, now: clock_out(db, user_id, session=session, now=now),
+        "⏹️ Clocked out!",
+    ),
+    "confirm": (
+        lambda db, user_id, session, now: confirm_session(db, session.id, user_id, session=session),
+        "✅ Session confirmed!",
+    ),
+    "reopen": (
+        lambda db, user_id, session, now: reopen_session(db, session.id, user_id),
+        "↩️ Session reopened!",
+    ),
+}
+
+
+def _update_message_response(session, prefix: str, now: datetime) -> Response:
+    """Build an UPDATE_MESSAGE response showing the session under a status line."""
+    effective = calculate_effective_time(session, now)
+    msg = create_session_status_message(session, effective)
+    msg["content"] = f"{prefix}\n\n" + msg["content"]
+    msg["flags"] = 0  # Make visible
+    return ORJSONResponse({"type": 7, "data": msg})  # UPDATE_MESSAGE
 
 
 async def handle_button(
-    payload: Dict[str, Any],
+    interaction: Interaction,
     user_id: str,
     db: AsyncSession,
-) -> JSONResponse:
+) -> Response:
     """Handle button clicks."""
-    custom_id = payload.get("data", {}).get("custom_id", "")
+    custom_id = interaction.data.custom_id
     
     # Parse custom_id: "action:session_id"
-    parts = custom_id.split(":", 1)
-    if len(parts) != 2:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Invalid button."}
-        })
-    
-    action, session_id_str = parts
+    action, sep, session_id_str = custom_id.partition(":")
+    if not sep:
+        return _reply(_INVALID_BUTTON)
     
     try:
         session_id = UUID(session_id_str)
     except ValueError:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Invalid session ID."}
-        })
+        return _reply(_INVALID_SESSION_ID)
     
     # Verify session ownership
     session = await get_session_by_id(db, session_id, user_id)
     if not session:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "❌ Session not found or access denied."}
-        })
+        return _reply(_SESSION_ACCESS_DENIED)
     
-    # Handle actions
-    if action == "pause":
-        session = await pause_session(db, user_id)
+    # Handle session-mutating actions
+    if action in _BUTTON_ACTIONS:
+        operation, prefix = _BUTTON_ACTIONS[action]
+        now = datetime.now(timezone.utc)
+        session = await operation(db, user_id, session, now)
         if session:
             await db.commit()
-            effective = calculate_effective_time(session)
-            msg = create_session_status_message(session, effective)
-            msg["content"] = "⏸️ Session paused!\n\n" + msg["content"]
-            msg["flags"] = 0  # Make visible
-            return JSONResponse({"type": 7, "data": msg})  # UPDATE_MESSAGE
-        
-    elif action == "resume":
-        session = await resume_session(db, user_id)
-        if session:
-            await db.commit()
-            effective = calculate_effective_time(session)
-            msg = create_session_status_message(session, effective)
-            msg["content"] = "▶️ Session resumed!\n\n" + msg["content"]
-            msg["flags"] = 0
-            return JSONResponse({"type": 7, "data": msg})
-        
-    elif action == "out":
-        session = await clock_out(db, user_id)
-        if session:
-            await db.commit()
-            effective = calculate_effective_time(session)
-            msg = create_session_status_message(session, effective)
-            msg["content"] = "⏹️ Clocked out!\n\n" + msg["content"]
-            msg["flags"] = 0
-            return JSONResponse({"type": 7, "data": msg})
-        
-    elif action == "confirm":
-        session = await confirm_session(db, session_id, user_id)
-        if session:
-            await db.commit()
-            effective = calculate_effective_time(session)
-            msg = create_session_status_message(session, effective)
-            msg["content"] = "✅ Session confirmed!\n\n" + msg["content"]
-            msg["components"] = []  # Remove buttons
-            msg["flags"] = 0
-            return JSONResponse({"type": 7, "data": msg})
-        
-    elif action == "reopen":
-        session = await reopen_session(db, session_id, user_id)
-        if session:
-            await db.commit()
-            effective = calculate_effective_time(session)
-            msg = create_session_status_message(session, effective)
-            msg["content"] = "↩️ Session reopened!\n\n" + msg["content"]
-            msg["flags"] = 0
-            return JSONResponse({"type": 7, "data": msg})
-        else:
-            return JSONResponse({
-                "type": 4,
-                "data": {"content": "❌ Cannot reopen: you have another active session.", "flags": 64}
-            })
+            return _update_message_response(session, prefix, now)
+        if action == "reopen":
+            return _reply(_CANNOT_REOPEN)
         
     elif action == "adjust_time":
         # Show modal for time adjustment
-        return JSONResponse({
+        return ORJSONResponse({
             "type": 9,  # MODAL
             "data": {
                 "custom_id": f"modal_adjust:{session_id}",
@@ -537,7 +590,7 @@ async def handle_button(
     elif action == "edit_goal":
         # Show modal for editing goal
         current_goal = session.goal or ""
-        return JSONResponse({
+        return ORJSONResponse({
             "type": 9,  # MODAL
             "data": {
                 "custom_id": f"modal_goal:{session_id}",
@@ -562,59 +615,42 @@ async def handle_button(
             }
         })
     
-    return JSONResponse({
-        "type": 4,
-        "data": {"content": "Action failed.", "flags": 64}
-    })
+    return _reply(_ACTION_FAILED)
 
 
 async def handle_modal(
-    payload: Dict[str, Any],
+    interaction: Interaction,
     user_id: str,
     db: AsyncSession,
-) -> JSONResponse:
+) -> Response:
     """Handle modal submissions."""
-    custom_id = payload.get("data", {}).get("custom_id", "")
+    custom_id = interaction.data.custom_id
     
     # Parse custom_id: "modal_action:session_id"
-    parts = custom_id.split(":", 1)
-    if len(parts) != 2:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Invalid modal."}
-        })
-    
-    modal_type, session_id_str = parts
+    modal_type, sep, session_id_str = custom_id.partition(":")
+    if not sep:
+        return _reply(_INVALID_MODAL)
     
     try:
-        session_id = UUID(session_id_str.split("_")[-1] if "_" in session_id_str else session_id_str)
+        session_id = UUID(session_id_str.rpartition("_")[2])
     except ValueError:
-        return JSONResponse({
-            "type": 4,
-            "data": {"content": "Invalid session ID."}
-        })
+        return _reply(_INVALID_SESSION_ID)
     
     # Extract form values
-    components = payload.get("data", {}).get("components", [])
-    values = {}
-    for action_row in components:
-        for component in action_row.get("components", []):
-            values[component["custom_id"]] = component["value"]
+    values = {
+        component.custom_id: component.value
+        for action_row in interaction.data.components
+        for component in action_row.components
+    }
     
     if modal_type == "modal_adjust":
         duration_str = values.get("duration", "").strip()
         if not duration_str:
-            return JSONResponse({
-                "type": 4,
-                "data": {"content": "❌ Duration is required.", "flags": 64}
-            })
+            return _reply(_DURATION_REQUIRED)
         
         session = await adjust_effective_time(db, session_id, user_id, duration_str)
         if not session:
-            return JSONResponse({
-                "type": 4,
-                "data": {"content": "❌ Failed to adjust time. Check your format.", "flags": 64}
-            })
+            return _reply(_ADJUST_FAILED)
         
         await db.commit()
         
@@ -622,17 +658,14 @@ async def handle_modal(
         msg = create_session_status_message(session, effective)
         msg["content"] = "✏️ Time adjusted!\n\n" + msg["content"]
         
-        return JSONResponse({"type": 4, "data": msg})
+        return ORJSONResponse({"type": 4, "data": msg})
         
     elif modal_type == "modal_goal":
         goal = values.get("goal", "").strip()
         
         session = await update_session_goal(db, session_id, user_id, goal)
         if not session:
-            return JSONResponse({
-                "type": 4,
-                "data": {"content": "❌ Failed to update goal.", "flags": 64}
-            })
+            return _reply(_GOAL_UPDATE_FAILED)
         
         await db.commit()
         
@@ -640,9 +673,6 @@ async def handle_modal(
         msg = create_session_status_message(session, effective)
         msg["content"] = "✏️ Goal updated!\n\n" + msg["content"]
         
-        return JSONResponse({"type": 4, "data": msg})
+        return ORJSONResponse({"type": 4, "data": msg})
     
-    return JSONResponse({
-        "type": 4,
-        "data": {"content": "Unknown modal type.", "flags": 64}
-    })
+    return _reply(_UNKNOWN_MODAL)
@@ -0,0 +1,58 @@
+"""Typed Discord interaction payloads, decoded with msgspec."""
+from typing import Any, List, Optional
+
+import msgspec
+
+
+class User(msgspec.Struct):
+    """Discord user that triggered the interaction."""
+    id: str
+
+
+class Member(msgspec.Struct):
+    """Guild member wrapper around the invoking user."""
+    user: User
+
+
+class Option(msgspec.Struct):
+    """Slash command option; sub-commands carry their own options."""
+    name: str
+    type: int
+    value: Any = None
+    options: List["Option"] = []
+
+
+class Component(msgspec.Struct):
+    """Message or modal component; action rows nest their children."""
+    type: int = 0
+    custom_id: str = ""
+    value: Any = None
+    components: List["Component"] = []
+
+
+class InteractionData(msgspec.Struct):
+    """Interaction data for commands, button clicks and modal submits."""
+    name: Optional[str] = None
+    options: List[Option] = []
+    custom_id: str = ""
+    components: List[Component] = []
+
+
+class Interaction(msgspec.Struct):
+    """Incoming Discord interaction. Fields the bot does not use are ignored."""
+    type: int
+    id: Optional[str] = None
+    application_id: Optional[str] = None
+    token: Optional[str] = None
+    data: InteractionData = msgspec.field(default_factory=InteractionData)
+    member: Optional[Member] = None
+    user: Optional[User] = None
+
+    @property
+    def user_id(self) -> Optional[str]:
+        """ID of the invoking user, whether in a guild or a DM."""
+        if self.member is not None:
+            return self.member.user.id
+        if self.user is not None:
+            return self.user.id
+        return None
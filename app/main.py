@@ -1,19 +1,26 @@
 """Main FastAPI application for Discord time-tracking bot."""
+import asyncio
 from contextlib import asynccontextmanager
 import os
+import sys
 from typing import Any, Dict, List
 
 import httpx
+import orjson
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response
 from dotenv import load_dotenv
 
+from app.cache import listen_for_session_events
 from app.discord_router import router as discord_router
+from app.write_queue import run_write_behind
 
 load_dotenv()
 
 DISCORD_BOT_TOKEN = os.environ.get("DISCORD_BOT_TOKEN")
 DISCORD_APP_ID = os.environ.get("DISCORD_APP_ID")
 DISCORD_GUILD_ID = os.environ.get("DISCORD_GUILD_ID")  # Optional for faster dev updates
+REGISTER_COMMANDS = os.environ.get("REGISTER_COMMANDS", "1") != "0"  # Off under multiple workers
 
 if not DISCORD_BOT_TOKEN:
     raise RuntimeError("Set DISCORD_BOT_TOKEN env var")
@@ -21,146 +28,191 @@ if not DISCORD_APP_ID:
     raise RuntimeError("Set DISCORD_APP_ID env var")
 
 
-async def register_commands() -> None:
+# Slash commands registered with Discord on startup
+COMMANDS: List[Dict[str, Any]] = [
+    {
+        "name": "session",
+        "description": "Manage time tracking sessions",
+        "type": 1,  # CHAT_INPUT
+        "options": [
+            {
+                "name": "in",
+                "description": "Clock in to a new session",
+                "type": 1,  # SUB_COMMAND
+                "options": [
+                    {
+                        "name": "subject",
+                        "description": "Subject/topic name",
+                        "type": 3,  # STRING
+                        "required": True,
+                    },
+                    {
+                        "name": "goal",
+                        "description": "Session goal or purpose",
+                        "type": 3,  # STRING
+                        "required": False,
+                    },
+                ],
+            },
+            {
+                "name": "out",
+                "description": "Clock out of current session",
+                "type": 1,
+                "options": [
+                    {
+                        "name": "note",
+                        "description": "Optional note about the session",
+                        "type": 3,
+                        "required": False,
+                    },
+                ],
+            },
+            {
+                "name": "pause",
+                "description": "Pause the current session",
+                "type": 1,
+            },
+            {
+                "name": "resume",
+                "description": "Resume the paused session",
+                "type": 1,
+            },
+            {
+                "name": "status",
+                "description": "Show current session status",
+                "type": 1,
+            },
+        ],
+    },
+    {
+        "name": "alloc",
+        "description": "Manage weekly time allocations",
+        "type": 1,
+        "options": [
+            {
+                "name": "set",
+                "description": "Set weekly allocation for a subject",
+                "type": 1,
+                "options": [
+                    {
+                        "name": "subject",
+                        "description": "Subject name",
+                        "type": 3,
+                        "required": True,
+                    },
+                    {
+                        "name": "hours",
+                        "description": "Hours allocated per week",
+                        "type": 10,  # NUMBER
+                        "required": True,
+                        "min_value": 0,
+                    },
+                ],
+            },
+            {
+                "name": "show",
+                "description": "Show weekly allocations and progress",
+                "type": 1,
+            },
+        ],
+    },
+]
+
+# Serialized once at import; the command set is static
+_COMMANDS_JSON: bytes = orjson.dumps(COMMANDS)
+
+
+async def register_commands(client: httpx.AsyncClient) -> None:
     """
-    Register Discord slash commands on startup.
+    Register Discord slash commands, replacing the existing set.
     
     - If DISCORD_GUILD_ID is set: register as guild commands (instant updates)
     - Else: register as global commands (slower propagation)
     """
-    commands: List[Dict[str, Any]] = [
-        {
-            "name": "session",
-            "description": "Manage time tracking sessions",
-            "type": 1,  # CHAT_INPUT
-            "options": [
-                {
-                    "name": "in",
-                    "description": "Clock in to a new session",
-                    "type": 1,  # SUB_COMMAND
-                    "options": [
-                        {
-                            "name": "subject",
-                            "description": "Subject/topic name",
-                            "type": 3,  # STRING
-                            "required": True,
-                        },
-                        {
-                            "name": "goal",
-                            "description": "Session goal or purpose",
-                            "type": 3,  # STRING
-                            "required": False,
-                        },
-                    ],
-                },
-                {
-                    "name": "out",
-                    "description": "Clock out of current session",
-                    "type": 1,
-                    "options": [
-                        {
-                            "name": "note",
-                            "description": "Optional note about the session",
-                            "type": 3,
-                            "required": False,
-                        },
-                    ],
-                },
-                {
-                    "name": "pause",
-                    "description": "Pause the current session",
-                    "type": 1,
-                },
-                {
-                    "name": "resume",
-                    "description": "Resume the paused session",
-                    "type": 1,
-                },
-                {
-                    "name": "status",
-                    "description": "Show current session status",
-                    "type": 1,
-                },
-            ],
-        },
-        {
-            "name": "alloc",
-            "description": "Manage weekly time allocations",
-            "type": 1,
-            "options": [
-                {
-                    "name": "set",
-                    "description": "Set weekly allocation for a subject",
-                    "type": 1,
-                    "options": [
-                        {
-                            "name": "subject",
-                            "description": "Subject name",
-                            "type": 3,
-                            "required": True,
-                        },
-                        {
-                            "name": "hours",
-                            "description": "Hours allocated per week",
-                            "type": 10,  # NUMBER
-                            "required": True,
-                            "min_value": 0,
-                        },
-                    ],
-                },
-                {
-                    "name": "show",
-                    "description": "Show weekly allocations and progress",
-                    "type": 1,
-                },
-            ],
-        },
-    ]
-
     # Choose endpoint based on guild vs global registration
     if DISCORD_GUILD_ID:
-        url = f"https://discord.com/api/v10/applications/{DISCORD_APP_ID}/guilds/{DISCORD_GUILD_ID}/commands"
+        url = f"/applications/{DISCORD_APP_ID}/guilds/{DISCORD_GUILD_ID}/commands"
     else:
-        url = f"https://discord.com/api/v10/applications/{DISCORD_APP_ID}/commands"
+        url = f"/applications/{DISCORD_APP_ID}/commands"
 
-    headers = {
-        "Authorization": f"Bot {DISCORD_BOT_TOKEN}",
-        "Content-Type": "application/json",
-    }
+    headers = {"Content-Type": "application/json"}
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        r = await client.put(url, headers=headers, json=commands)
-        if r.status_code >= 400:
-            raise RuntimeError(f"Command registration failed: {r.status_code} {r.text}")
+    r = await client.put(url, headers=headers, content=_COMMANDS_JSON)
+    if r.status_code >= 400:
+        raise RuntimeError(f"Command registration failed: {r.status_code} {r.text}")
 
     scope = "guild" if DISCORD_GUILD_ID else "global"
-    print(f"✅ Registered {len(commands)} commands ({scope})")
+    print(f"✅ Registered {len(COMMANDS)} commands ({scope})")
+
+
+def _discord_client() -> httpx.AsyncClient:
+    """Create an HTTP client authenticated as the bot against the Discord API."""
+    return httpx.AsyncClient(
+        base_url="https://discord.com/api/v10",
+        http2=True,
+        headers={"Authorization": f"Bot {DISCORD_BOT_TOKEN}"},
+        limits=httpx.Limits(max_keepalive_connections=20),
+        timeout=20.0,
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan: register commands on startup."""
-    await register_commands()
-    yield
+    """
+    Application lifespan: open the shared Discord HTTP client, listen for
+    session changes, start the write-behind queue and register commands on
+    startup; flush pending writes and close everything on shutdown.
+    """
+    async with listen_for_session_events(), run_write_behind(), _discord_client() as client:
+        app.state.http = client
+        if REGISTER_COMMANDS:
+            # Commands persist on Discord's side, so a failed (e.g. rate
+            # limited) registration must not keep the bot from serving
+            try:
+                await register_commands(client)
+            except Exception as e:
+                print(f"⚠️ Skipping command registration: {e!r}")
+        yield
 
 
 app = FastAPI(
     title="Flae Time Tracking Bot",
     description="Discord bot for personal time tracking with sessions and weekly allocations",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Include Discord interactions router
 app.include_router(discord_router, prefix="/discord")
 
 
+# Static health bodies, serialized once and cacheable by load balancers
+_ROOT_BODY = orjson.dumps({"status": "ok", "service": "flae-bot"})
+_HEALTH_BODY = orjson.dumps({"status": "healthy"})
+_HEALTH_HEADERS = {"Cache-Control": "public, max-age=60"}
+
+
 @app.get("/")
-async def root():
+async def root() -> Response:
     """Health check endpoint."""
-    return {"status": "ok", "service": "flae-bot"}
+    return Response(content=_ROOT_BODY, media_type="application/json", headers=_HEALTH_HEADERS)
 
 
 @app.get("/health")
-async def health():
+async def health() -> Response:
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return Response(content=_HEALTH_BODY, media_type="application/json", headers=_HEALTH_HEADERS)
+
+
+async def _register_once() -> None:
+    """Register slash commands with a short-lived client."""
+    async with _discord_client() as client:
+        await register_commands(client)
+
+
+if __name__ == "__main__":
+    # One-shot registration for multi-worker deployments:
+    #   python -m app.main register
+    if sys.argv[1:] != ["register"]:
+        sys.exit("Usage: python -m app.main register")
+    asyncio.run(_register_once())
@@ -1,23 +1,34 @@
 """SQLAlchemy models for the time-tracking bot."""
-from datetime import datetime
+import os
+from datetime import date, datetime
 from typing import Optional
 from uuid import uuid4
 
 from sqlalchemy import (
     CheckConstraint,
+    Computed,
     Date,
+    Enum,
     ForeignKey,
     Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 
 from app.database import Base
 
+# STRICT_LAZY=1 makes any implicit lazy load raise instead of emitting SQL,
+# surfacing N+1 queries (and async lazy loads) in development
+_LAZY = "raise_on_sql" if os.environ.get("STRICT_LAZY", "0") == "1" else "select"
+
+# Session lifecycle states, stored as the native session_status enum
+SESSION_STATUSES = ("RUNNING", "PAUSED", "ENDED_UNCONFIRMED", "ENDED_CONFIRMED")
+
 
 class User(Base):
     """Discord user."""
@@ -31,9 +42,9 @@ class User(Base):
     )
 
     # Relationships
-    subjects: Mapped[list["Subject"]] = relationship(back_populates="user", cascade="all, delete-orphan")
-    allocations: Mapped[list["WeeklyAllocation"]] = relationship(back_populates="user", cascade="all, delete-orphan")
-    sessions: Mapped[list["Session"]] = relationship(back_populates="user", cascade="all, delete-orphan")
+    subjects: Mapped[list["Subject"]] = relationship(back_populates="user", cascade="all, delete-orphan", lazy=_LAZY)
+    allocations: Mapped[list["WeeklyAllocation"]] = relationship(back_populates="user", cascade="all, delete-orphan", lazy=_LAZY)
+    sessions: Mapped[list["Session"]] = relationship(back_populates="user", cascade="all, delete-orphan", lazy=_LAZY)
 
 
 class Subject(Base):
@@ -58,9 +69,9 @@ class Subject(Base):
     )
 
     # Relationships
-    user: Mapped["User"] = relationship(back_populates="subjects")
-    allocations: Mapped[list["WeeklyAllocation"]] = relationship(back_populates="subject", cascade="all, delete-orphan")
-    sessions: Mapped[list["Session"]] = relationship(back_populates="subject", cascade="all, delete-orphan")
+    user: Mapped["User"] = relationship(back_populates="subjects", lazy=_LAZY)
+    allocations: Mapped[list["WeeklyAllocation"]] = relationship(back_populates="subject", cascade="all, delete-orphan", lazy=_LAZY)
+    sessions: Mapped[list["Session"]] = relationship(back_populates="subject", cascade="all, delete-orphan", lazy=_LAZY)
 
     __table_args__ = (
         UniqueConstraint("user_id", "name", name="uq_user_subject_name"),
@@ -87,7 +98,7 @@ class WeeklyAllocation(Base):
         ForeignKey("subjects.id", ondelete="CASCADE"),
         nullable=False,
     )
-    week_start_date: Mapped[datetime] = mapped_column(Date, nullable=False)
+    week_start_date: Mapped[date] = mapped_column(Date, nullable=False)
     minutes_allocated: Mapped[int] = mapped_column(Integer, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
@@ -102,14 +113,15 @@ class WeeklyAllocation(Base):
     )
 
     # Relationships
-    user: Mapped["User"] = relationship(back_populates="allocations")
-    subject: Mapped["Subject"] = relationship(back_populates="allocations")
+    user: Mapped["User"] = relationship(back_populates="allocations", lazy=_LAZY)
+    subject: Mapped["Subject"] = relationship(back_populates="allocations", lazy=_LAZY)
 
     __table_args__ = (
-        UniqueConstraint("user_id", "subject_id", "week_start_date", name="uq_user_subject_week"),
+        # subject_id leads: it is the most selective column for upsert lookups,
+        # and the (subject_id, week_start_date) prefix serves subject/week queries
+        UniqueConstraint("subject_id", "week_start_date", "user_id", name="uq_user_subject_week"),
         CheckConstraint("minutes_allocated >= 0", name="ck_minutes_allocated_positive"),
         Index("ix_allocations_user_week", "user_id", "week_start_date"),
-        Index("ix_allocations_subject_week", "subject_id", "week_start_date"),
     )
 
 
@@ -143,10 +155,10 @@ class Session(Base):
     goal: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     note: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(
-        String,
+        Enum(*SESSION_STATUSES, name="session_status"),
         nullable=False,
         default="RUNNING",
-    )  # RUNNING, PAUSED, ENDED_UNCONFIRMED, ENDED_CONFIRMED
+    )
     total_paused_seconds: Mapped[int] = mapped_column(
         Integer,
         nullable=False,
@@ -160,6 +172,16 @@ class Session(Base):
         Integer,
         nullable=True,
     )
+    # Effective seconds of an ended session, maintained by Postgres
+    duration_seconds: Mapped[Optional[int]] = mapped_column(
+        Integer,
+        Computed(
+            "COALESCE(effective_override_seconds, "
+            "GREATEST(trunc(EXTRACT(EPOCH FROM (ended_at - started_at)))::int "
+            "- total_paused_seconds, 0))",
+            persisted=True,
+        ),
+    )
     created_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True),
         default=datetime.utcnow,
@@ -173,8 +195,8 @@ class Session(Base):
     )
 
     # Relationships
-    user: Mapped["User"] = relationship(back_populates="sessions")
-    subject: Mapped["Subject"] = relationship(back_populates="sessions")
+    user: Mapped["User"] = relationship(back_populates="sessions", lazy=_LAZY)
+    subject: Mapped["Subject"] = relationship(back_populates="sessions", lazy=_LAZY)
 
     __table_args__ = (
         CheckConstraint("total_paused_seconds >= 0", name="ck_total_paused_seconds_positive"),
@@ -182,6 +204,20 @@ class Session(Base):
             "effective_override_seconds IS NULL OR effective_override_seconds >= 0",
             name="ck_effective_override_seconds_positive",
         ),
-        Index("ix_sessions_user_status", "user_id", "status"),
+        # At most one active session per user; also the active-session lookup
+        Index(
+            "uq_sessions_active_per_user",
+            "user_id",
+            unique=True,
+            postgresql_where=text("status IN ('RUNNING', 'PAUSED')"),
+        ),
         Index("ix_sessions_user_started", "user_id", "started_at"),
+        Index(
+            "ix_sessions_confirmed_agg",
+            "user_id",
+            "subject_id",
+            "started_at",
+            postgresql_include=["duration_seconds"],
+            postgresql_where=text("status = 'ENDED_CONFIRMED'"),
+        ),
     )
@@ -1,14 +1,91 @@
 """Session management service for time tracking."""
 import re
 from datetime import datetime, timezone
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Any, Optional, Tuple
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Integer, and_, bindparam, case, cast, exists, extract, func, literal, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-
+from sqlalchemy.orm import aliased, joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.cache import (
+    UNKNOWN,
+    cache_subject,
+    forget_active_session,
+    get_cached_active_session_id,
+    remember_active_session,
+    stage_active_session,
+    subject_cache,
+)
 from app.models import Session, Subject, User
 
+# clock_in lookups fused into one statement: the subject (outer-joined so
+# the row always exists), whether the user exists and any active session id
+_CLOCK_IN_LOOKUP = (
+    select(
+        Subject,
+        select(User.id)
+        .where(User.id == bindparam("user_id"))
+        .scalar_subquery()
+        .label("known_user"),
+        select(Session.id)
+        .where(
+            Session.user_id == bindparam("user_id"),
+            Session.status.in_(["RUNNING", "PAUSED"])
+        )
+        .limit(1)
+        .scalar_subquery()
+        .label("active_session_id"),
+    )
+    .select_from(select(literal(1)).subquery())
+    .outerjoin(
+        Subject,
+        and_(
+            Subject.user_id == bindparam("user_id"),
+            Subject.name == bindparam("subject_name")
+        )
+    )
+)
+
+# Active sessions are only ever mutated and rendered as a status message, so
+# note, the audit timestamps and duration_seconds are left unloaded
+_ACTIVE_SESSION_OPTIONS = [
+    load_only(
+        Session.id,
+        Session.user_id,
+        Session.subject_id,
+        Session.started_at,
+        Session.ended_at,
+        Session.goal,
+        Session.status,
+        Session.total_paused_seconds,
+        Session.pause_started_at,
+        Session.effective_override_seconds,
+    ),
+    joinedload(Session.subject),
+]
+
+_ACTIVE_SESSION_STMT = (
+    select(Session)
+    .options(*_ACTIVE_SESSION_OPTIONS)
+    .where(
+        Session.user_id == bindparam("user_id"),
+        Session.status.in_(["RUNNING", "PAUSED"])
+    )
+)
+
+_SUBJECT_BY_NAME_STMT = select(Subject).where(
+    Subject.user_id == bindparam("user_id"),
+    Subject.name == bindparam("subject_name")
+)
+
+# Value/unit pairs like "2h", "30m", "45s"
+_DURATION_RE = re.compile(r'(\d+\.?\d*)\s*([hms])')
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1}
+
 
 def parse_duration(duration_str: str) -> int:
     """
@@ -34,12 +111,18 @@ def parse_duration(duration_str: str) -> int:
             except ValueError:
                 pass
     
+    # Fast path for a single whole value like "2h" or "30m"
+    unit_seconds = _UNIT_SECONDS.get(duration_str[-1:])
+    if unit_seconds is not None:
+        value = duration_str[:-1].rstrip()
+        if value.isdecimal():
+            return int(float(value) * unit_seconds)
+    
     # Try parsing with h/m/s suffixes
     total_seconds = 0
     
     # Find all patterns like "2h", "30m", "45s"
-    pattern = r'(\d+\.?\d*)\s*([hms])'
-    matches = re.findall(pattern, duration_str)
+    matches = _DURATION_RE.findall(duration_str)
     
     if matches:
         for value, unit in matches:
@@ -60,24 +143,21 @@ def parse_duration(duration_str: str) -> int:
         raise ValueError(f"Cannot parse duration: {duration_str}")
 
 
+@lru_cache(maxsize=8192)
 def format_duration(seconds: int) -> str:
     """Format seconds as human-readable duration."""
-    if seconds < 0:
+    if seconds <= 0:
         return "0m"
     
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
-    
-    parts = []
-    if hours > 0:
-        parts.append(f"{hours}h")
-    if minutes > 0:
-        parts.append(f"{minutes}m")
-    if secs > 0 and hours == 0:  # Only show seconds if less than an hour
-        parts.append(f"{secs}s")
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
     
-    return " ".join(parts) if parts else "0m"
+    # Only show seconds if less than an hour
+    if hours:
+        return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+    if minutes:
+        return f"{minutes}m {secs}s" if secs else f"{minutes}m"
+    return f"{secs}s"
 
 
 def calculate_effective_time(session: Session, now: Optional[datetime] = None) -> int:
@@ -87,13 +167,13 @@ def calculate_effective_time(session: Session, now: Optional[datetime] = None) -
     If effective_override_seconds is set, use that.
     Otherwise: (now - started_at) - total_paused_seconds - current_pause_duration
     """
-    if now is None:
-        now = datetime.now(timezone.utc)
-    
     # If override is set, use it
     if session.effective_override_seconds is not None:
         return session.effective_override_seconds
     
+    if now is None:
+        now = datetime.now(timezone.utc)
+    
     # Calculate end time
     end_time = session.ended_at if session.ended_at else now
     
@@ -113,15 +193,20 @@ def calculate_effective_time(session: Session, now: Optional[datetime] = None) -
     return effective
 
 
-async def get_or_create_user(db: AsyncSession, user_id: str) -> User:
-    """Get or create a user."""
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+async def get_or_create_user(db: AsyncSession, user_id: str, flush: bool = True) -> User:
+    """
+    Get or create a user.
+    
+    Pass flush=False when a later flush in the same unit of work (e.g.
+    creating one of the user's subjects) will insert the user anyway.
+    """
+    user = await db.get(User, user_id)
     
     if not user:
         user = User(id=user_id)
         db.add(user)
-        await db.flush()
+        if flush:
+            await db.flush()
     
     return user
 
@@ -129,16 +214,25 @@ async def get_or_create_user(db: AsyncSession, user_id: str) -> User:
 async def get_or_create_subject(
     db: AsyncSession, user_id: str, subject_name: str
 ) -> Subject:
-    """Get or create a subject for a user."""
+    """
+    Get or create a subject for a user.
+    
+    Existing subjects are served from the in-process cache when possible.
+    A subject found by SELECT is only cached once this transaction commits,
+    since the row may be an uncommitted insert from earlier in it.
+    """
+    cached = subject_cache.get((user_id, subject_name))
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    
     result = await db.execute(
-        select(Subject).where(
-            Subject.user_id == user_id,
-            Subject.name == subject_name
-        )
+        _SUBJECT_BY_NAME_STMT, {"user_id": user_id, "subject_name": subject_name}
     )
     subject = result.scalar_one_or_none()
     
-    if not subject:
+    if subject:
+        cache_subject(db, subject)
+    else:
         subject = Subject(user_id=user_id, name=subject_name)
         db.add(subject)
         await db.flush()
@@ -146,15 +240,65 @@ async def get_or_create_subject(
     return subject
 
 
-async def get_active_session(db: AsyncSession, user_id: str) -> Optional[Session]:
-    """Get the active session for a user (RUNNING or PAUSED)."""
+async def _attach_subject(db: AsyncSession, session: Session) -> None:
+    """Set session.subject from the identity map or subject cache, else load it."""
+    cached = subject_cache.get(session.subject_id)
+    if cached is not None:
+        subject = await db.merge(cached, load=False)
+    else:
+        subject = await db.get(Subject, session.subject_id)
+        cache_subject(db, subject)
+    set_committed_value(session, "subject", subject)
+
+
+async def _update_session(db: AsyncSession, *criteria: Any, **values: Any) -> Optional[Session]:
+    """
+    Apply values to the session matching criteria with one UPDATE ... RETURNING.
+    
+    Returns the updated session with its subject attached, or None if no
+    row matched.
+    """
     result = await db.execute(
-        select(Session).where(
-            Session.user_id == user_id,
-            Session.status.in_(["RUNNING", "PAUSED"])
-        )
+        update(Session)
+        .where(*criteria)
+        .values(**values)
+        .returning(Session)
+        .execution_options(populate_existing=True)
     )
-    return result.scalar_one_or_none()
+    session = result.scalar_one_or_none()
+    if session is not None:
+        await _attach_subject(db, session)
+    return session
+
+
+def _pause_seconds(now: datetime) -> Any:
+    """SQL expression for whole seconds paused since pause_started_at (0 if unset)."""
+    return func.coalesce(
+        cast(func.trunc(extract("epoch", now - Session.pause_started_at)), Integer),
+        0,
+    )
+
+
+async def get_active_session(db: AsyncSession, user_id: str) -> Optional[Session]:
+    """
+    Get the active session for a user (RUNNING or PAUSED).
+    
+    Consults the in-process active session cache first; a cached id is
+    re-checked by primary key, and the indexed lookup is the fallback.
+    """
+    cached = get_cached_active_session_id(user_id)
+    if cached is None:
+        return None
+    if cached is not UNKNOWN:
+        session = await db.get(Session, cached, options=_ACTIVE_SESSION_OPTIONS)
+        if session and session.status in ("RUNNING", "PAUSED"):
+            return session
+    
+    result = await db.execute(_ACTIVE_SESSION_STMT, {"user_id": user_id})
+    session = result.scalar_one_or_none()
+    if session:
+        remember_active_session(user_id, session.id)
+    return session
 
 
 async def clock_in(
@@ -162,6 +306,7 @@ async def clock_in(
     user_id: str,
     subject_name: str,
     goal: Optional[str] = None,
+    now: Optional[datetime] = None,
 ) -> Tuple[Session, bool]:
     """
     Clock in to a new session.
@@ -169,29 +314,53 @@ async def clock_in(
     Returns (session, is_new).
     If user already has an active session, returns (existing_session, False).
     """
-    # Ensure user exists
-    await get_or_create_user(db, user_id)
+    if now is None:
+        now = datetime.now(timezone.utc)
+    
+    # One round trip for the user, any active session and the subject
+    row = (await db.execute(
+        _CLOCK_IN_LOOKUP,
+        {"user_id": user_id, "subject_name": subject_name},
+    )).one()
+    subject, known_user, active_session_id = row
     
-    # Check for active session
-    existing = await get_active_session(db, user_id)
-    if existing:
+    if active_session_id is not None:
+        remember_active_session(user_id, active_session_id)
+        existing = await db.get(Session, active_session_id, options=_ACTIVE_SESSION_OPTIONS)
         return existing, False
     
-    # Get or create subject
-    subject = await get_or_create_subject(db, user_id, subject_name)
+    # Unit of work inserts user, subject and session in dependency order
+    if known_user is None:
+        db.add(User(id=user_id))
+    if subject is None:
+        subject = Subject(user_id=user_id, name=subject_name)
+        db.add(subject)
+    else:
+        cache_subject(db, subject)
     
     # Create new session
     session = Session(
         user_id=user_id,
-        subject_id=subject.id,
-        started_at=datetime.now(timezone.utc),
+        subject=subject,
+        started_at=now,
         goal=goal,
         status="RUNNING",
         total_paused_seconds=0,
     )
     db.add(session)
-    await db.flush()
-    await db.refresh(session, ["subject"])
+    try:
+        await db.flush()
+    except IntegrityError:
+        # A concurrent clock-in won the race for uq_sessions_active_per_user.
+        # The transaction holds nothing but this clock-in, so drop it and
+        # return the winner.
+        await db.rollback()
+        forget_active_session(user_id)
+        existing = await get_active_session(db, user_id)
+        if existing is None:
+            raise
+        return existing, False
+    stage_active_session(db, user_id, session.id)
     
     return session, True
 
@@ -200,78 +369,118 @@ async def clock_out(
     db: AsyncSession,
     user_id: str,
     note: Optional[str] = None,
+    session: Optional[Session] = None,
+    now: Optional[datetime] = None,
 ) -> Optional[Session]:
     """
     Clock out of active session.
     
+    If session is given (already loaded and owned by the user), that row is
+    updated instead of the user's active session. The status guard is part
+    of the UPDATE, so a concurrent change makes this return None. Pass the
+    request's now to keep it consistent with the rendered effective time.
+    
     Returns the session if successful, None if no active session.
     """
-    session = await get_active_session(db, user_id)
-    if not session:
+    if session is not None:
+        target = Session.id == session.id
+    elif get_cached_active_session_id(user_id) is None:
         return None
+    else:
+        target = Session.user_id == user_id
     
-    now = datetime.now(timezone.utc)
-    
-    # If paused, accrue the pause time
-    if session.status == "PAUSED" and session.pause_started_at:
-        pause_duration = int((now - session.pause_started_at).total_seconds())
-        session.total_paused_seconds += pause_duration
-        session.pause_started_at = None
-    
-    session.ended_at = now
-    session.status = "ENDED_UNCONFIRMED"
+    if now is None:
+        now = datetime.now(timezone.utc)
+    values = {
+        # If paused, accrue the pause time
+        "total_paused_seconds": Session.total_paused_seconds + case(
+            (Session.status == "PAUSED", _pause_seconds(now)),
+            else_=0,
+        ),
+        "pause_started_at": None,
+        "ended_at": now,
+        "status": "ENDED_UNCONFIRMED",
+    }
     if note:
-        session.note = note
+        values["note"] = note
     
-    await db.flush()
-    await db.refresh(session, ["subject"])
+    session = await _update_session(
+        db, target, Session.status.in_(["RUNNING", "PAUSED"]), **values
+    )
+    if session is not None:
+        stage_active_session(db, user_id, None)
     
     return session
 
 
-async def pause_session(db: AsyncSession, user_id: str) -> Optional[Session]:
+async def pause_session(
+    db: AsyncSession,
+    user_id: str,
+    session: Optional[Session] = None,
+    now: Optional[datetime] = None,
+) -> Optional[Session]:
     """
     Pause the active session.
     
+    If session is given (already loaded and owned by the user), that row is
+    updated instead of the user's active session. The status guard is part
+    of the UPDATE, so a concurrent change makes this return None. Pass the
+    request's now to keep it consistent with the rendered effective time.
+    
     Returns the session if successful, None if no RUNNING session.
     """
-    session = await get_active_session(db, user_id)
-    if not session or session.status != "RUNNING":
+    if session is not None:
+        target = Session.id == session.id
+    elif get_cached_active_session_id(user_id) is None:
         return None
+    else:
+        target = Session.user_id == user_id
     
-    session.status = "PAUSED"
-    session.pause_started_at = datetime.now(timezone.utc)
-    
-    await db.flush()
-    await db.refresh(session, ["subject"])
-    
-    return session
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return await _update_session(
+        db,
+        target,
+        Session.status == "RUNNING",
+        status="PAUSED",
+        pause_started_at=now,
+    )
 
 
-async def resume_session(db: AsyncSession, user_id: str) -> Optional[Session]:
+async def resume_session(
+    db: AsyncSession,
+    user_id: str,
+    session: Optional[Session] = None,
+    now: Optional[datetime] = None,
+) -> Optional[Session]:
     """
     Resume a paused session.
     
+    If session is given (already loaded and owned by the user), that row is
+    updated instead of the user's active session. The status guard is part
+    of the UPDATE, so a concurrent change makes this return None. Pass the
+    request's now to keep it consistent with the rendered effective time.
+    
     Returns the session if successful, None if no PAUSED session.
     """
-    session = await get_active_session(db, user_id)
-    if not session or session.status != "PAUSED":
+    if session is not None:
+        target = Session.id == session.id
+    elif get_cached_active_session_id(user_id) is None:
         return None
+    else:
+        target = Session.user_id == user_id
     
-    now = datetime.now(timezone.utc)
-    
+    if now is None:
+        now = datetime.now(timezone.utc)
     # Accrue pause time
-    if session.pause_started_at:
-        pause_duration = int((now - session.pause_started_at).total_seconds())
-        session.total_paused_seconds += pause_duration
-    
-    session.status = "RUNNING"
-    session.pause_started_at = None
-    
-    await db.flush()
-    await db.refresh(session, ["subject"])
-    
-    return session
+    return await _update_session(
+        db,
+        target,
+        Session.status == "PAUSED",
+        status="RUNNING",
+        total_paused_seconds=Session.total_paused_seconds + _pause_seconds(now),
+        pause_started_at=None,
+    )
 
 
 async def adjust_effective_time(
@@ -285,52 +494,45 @@ async def adjust_effective_time(
     
     Returns the session if successful, None if session not found or not owned by user.
     """
-    result = await db.execute(
-        select(Session).where(
-            Session.id == session_id,
-            Session.user_id == user_id
-        )
-    )
-    session = result.scalar_one_or_none()
-    
-    if not session:
-        return None
-    
     # Parse duration
     try:
         seconds = parse_duration(duration_str)
-        session.effective_override_seconds = seconds
-        await db.flush()
-        await db.refresh(session, ["subject"])
-        return session
     except ValueError:
         return None
+    
+    return await _update_session(
+        db,
+        Session.id == session_id,
+        Session.user_id == user_id,
+        effective_override_seconds=seconds,
+    )
 
 
 async def confirm_session(
     db: AsyncSession,
     session_id: UUID,
     user_id: str,
+    session: Optional[Session] = None,
 ) -> Optional[Session]:
     """
     Confirm a session (mark as ENDED_CONFIRMED).
     
+    If session is given (already loaded and owned by the user), it is used
+    instead of fetching session_id again.
+    
     Returns the session if successful, None if not found or not owned by user.
     """
-    result = await db.execute(
-        select(Session).where(
-            Session.id == session_id,
-            Session.user_id == user_id
-        )
-    )
-    session = result.scalar_one_or_none()
+    if session is None:
+        session = await get_session_by_id(db, session_id, user_id)
     
     if not session:
         return None
     
+    was_active = session.status in ("RUNNING", "PAUSED")
     session.status = "ENDED_CONFIRMED"
     await db.flush()
-    await db.refresh(session, ["subject"])
+    if was_active:
+        stage_active_session(db, user_id, None)
     
     return session
 
@@ -343,30 +545,34 @@ async def reopen_session(
     """
     Reopen an ended session (change from ENDED_* to RUNNING).
     
-    Returns the session if successful, None if not found or not owned by user.
+    Ownership and the "no other active session" guard are checked by the
+    UPDATE itself, so this is a single round trip.
+    
+    Returns the session if successful, None if not found, not owned by user,
+    or the user has another active session.
     """
-    result = await db.execute(
-        select(Session).where(
+    other_active = aliased(Session)
+    try:
+        session = await _update_session(
+            db,
             Session.id == session_id,
-            Session.user_id == user_id
+            Session.user_id == user_id,
+            ~exists().where(
+                other_active.user_id == user_id,
+                other_active.status.in_(["RUNNING", "PAUSED"])
+            ),
+            status="RUNNING",
+            ended_at=None,
+            effective_override_seconds=None,  # Clear override when reopening
         )
-    )
-    session = result.scalar_one_or_none()
-    
-    if not session:
-        return None
-    
-    # Check no other active session
-    active = await get_active_session(db, user_id)
-    if active:
+    except IntegrityError:
+        # A concurrent clock-in committed after our snapshot, so the NOT
+        # EXISTS guard passed but uq_sessions_active_per_user did not
+        await db.rollback()
+        forget_active_session(user_id)
         return None
-    
-    session.status = "RUNNING"
-    session.ended_at = None
-    session.effective_override_seconds = None  # Clear override when reopening
-    
-    await db.flush()
-    await db.refresh(session, ["subject"])
+    if session is not None:
+        stage_active_session(db, user_id, session.id)
     
     return session
 
@@ -382,22 +588,12 @@ async def update_session_goal(
     
     Returns the session if successful, None if not found or not owned by user.
     """
-    result = await db.execute(
-        select(Session).where(
-            Session.id == session_id,
-            Session.user_id == user_id
-        )
+    return await _update_session(
+        db,
+        Session.id == session_id,
+        Session.user_id == user_id,
+        goal=goal,
     )
-    session = result.scalar_one_or_none()
-    
-    if not session:
-        return None
-    
-    session.goal = goal
-    await db.flush()
-    await db.refresh(session, ["subject"])
-    
-    return session
 
 
 async def get_session_by_id(
@@ -406,13 +602,7 @@ async def get_session_by_id(
     user_id: str,
 ) -> Optional[Session]:
     """Get a session by ID, ensuring it belongs to the user."""
-    result = await db.execute(
-        select(Session).where(
-            Session.id == session_id,
-            Session.user_id == user_id
-        )
-    )
-    session = result.scalar_one_or_none()
-    if session:
-        await db.refresh(session, ["subject"])
+    session = await db.get(Session, session_id, options=[joinedload(Session.subject)])
+    if session is None or session.user_id != user_id:
+        return None
     return session
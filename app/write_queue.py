@@ -0,0 +1,86 @@
+"""Write-behind queue for idempotent writes that users don't wait on."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from app.database import AsyncSessionLocal
+
+# A queued write: operation(db, *args), applied inside a shared transaction
+WriteOp = Callable[..., Awaitable[Any]]
+QueuedWrite = Tuple[WriteOp, Tuple[Any, ...]]
+
+_BATCH_SIZE = 32
+_BATCH_WINDOW = 0.02  # seconds to wait for more writes before committing
+
+_queue: "Optional[asyncio.Queue[QueuedWrite]]" = None
+
+
+def enqueue_write(operation: WriteOp, *args: Any) -> None:
+    """
+    Queue operation(db, *args) to be applied after the response is sent.
+    
+    Only for idempotent writes whose result the caller can render without
+    reading it back; they are retried one by one if their batch fails.
+    """
+    if _queue is None:
+        raise RuntimeError("Write-behind queue is not running")
+    _queue.put_nowait((operation, args))
+
+
+async def _next_batch(queue: "asyncio.Queue[QueuedWrite]") -> List[QueuedWrite]:
+    """Wait for one write, then collect more for up to the batch window."""
+    batch = [await queue.get()]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + _BATCH_WINDOW
+    
+    while len(batch) < _BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    
+    return batch
+
+
+async def _apply(batch: List[QueuedWrite]) -> None:
+    """Apply a batch in one transaction."""
+    async with AsyncSessionLocal() as db:
+        for operation, args in batch:
+            await operation(db, *args)
+        await db.commit()
+
+
+async def _drain(queue: "asyncio.Queue[QueuedWrite]") -> None:
+    """Apply queued writes forever, one commit per batch."""
+    while True:
+        batch = await _next_batch(queue)
+        try:
+            await _apply(batch)
+        except Exception as e:
+            # Isolate the failing write so the rest of the batch still lands
+            print(f"⚠️ Write batch of {len(batch)} failed ({e!r}), retrying individually")
+            for item in batch:
+                try:
+                    await _apply([item])
+                except Exception as e:
+                    print(f"❌ Dropped write {item[0].__name__}{item[1]}: {e!r}")
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+@asynccontextmanager
+async def run_write_behind() -> AsyncIterator[None]:
+    """Run the queue consumer; on exit, flush pending writes before stopping."""
+    global _queue
+    _queue = asyncio.Queue()
+    consumer = asyncio.create_task(_drain(_queue))
+    try:
+        yield
+    finally:
+        await _queue.join()
+        consumer.cancel()
+        _queue = None